@@ -1,12 +1,66 @@
+# Run with: uvicorn main:app --loop uvloop --http httptools
+
 # 1. Imports
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+import httpx
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Dict
 from modules.llm_weather_answer import get_weather_llm_answer
+from modules.llm_extract_city_and_forecast_days import run_extraction_batcher
+from modules.gemini_client import warm_up as warm_up_gemini
+from modules.weatherapi_forecast_data import warm_up as warm_up_weatherapi
+
+# Debug output of the modules is off by default
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 2. Lifespan (shared HTTP client, extraction batcher, warm-up) and concurrency limit
+MAX_CONCURRENT_QUESTIONS = 1000
+question_semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUESTIONS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan handler.
+
+    Creates one `httpx.AsyncClient` per worker on startup and stores it in `app.state.http`,
+    so all outbound requests (IP geolocation, WeatherAPI) reuse pooled keep-alive connections
+    instead of opening a new TCP/TLS connection per request. Also starts the background task
+    that batches concurrent LLM extraction calls. Both are cleaned up on shutdown.
 
-# 2. FastAPI App instance and metadata
+    Before serving requests, the connections to Gemini and WeatherAPI are warmed up concurrently,
+    so the first user request does not pay for DNS lookups and TLS handshakes. Each warm-up is a
+    single attempt with a short timeout, so startup is delayed by at most a few seconds; failures
+    are only logged.
+    """
+    app.state.http = httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=100, max_connections=MAX_CONCURRENT_QUESTIONS),
+        timeout=10.0
+    )
+    results = await asyncio.gather(
+        warm_up_gemini(), warm_up_weatherapi(app.state.http), return_exceptions=True
+    )
+    for name, result in zip(("Gemini", "WeatherAPI"), results):
+        if isinstance(result, Exception):
+            logger.warning("%s warm-up failed: %r", name, result)
+
+    batcher = asyncio.create_task(run_extraction_batcher())
+    try:
+        yield
+    finally:
+        batcher.cancel()
+        await app.state.http.aclose()
+
+# 3. FastAPI App instance and metadata
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title="WeatherInsight",
     version="1.0.0",
     description=(
@@ -35,7 +89,7 @@ and provides weather forecasts for a specified city and date using WeatherAPI.
     }
 )
 
-# 3. Middleware (CORS)
+# 4. Middleware (CORS)
 origins = [
     'http://localhost:5173', 'http://localhost:5174', 
     'http://localhost:4173', 'http://localhost:4174', 
@@ -50,12 +104,12 @@ app.add_middleware(
     allow_headers=['*']
 )
 
-# 4. Pydantic models
+# 5. Pydantic models
 class HandleQuestionRequest(BaseModel):
     """Data model for handling a user question."""
     question: str
 
-# 5. Root endpoint
+# 6. Root endpoint
 @app.get("/")
 async def read_root():
     """
@@ -68,7 +122,7 @@ async def read_root():
     """
     return {"message": "FastAPI is up and running"}
 
-# 6. Main endpoint to handle user questions
+# 7. Main endpoint to handle user questions
 @app.post("/handle_question")
 async def handle_question(request: HandleQuestionRequest) -> Dict:
     """
@@ -78,12 +132,16 @@ async def handle_question(request: HandleQuestionRequest) -> Dict:
     1. Uses the LLM to extract city and forecast days from the question.
     2. Calls WeatherAPI to get weather forecast data.
     3. Uses the LLM to generate a friendly English text answer.
+
+    At most `MAX_CONCURRENT_QUESTIONS` questions are processed concurrently per worker.
     """
     try:
         question = request.question
+        now = datetime.now()  # taken once, so all steps of this request agree on the current day
 
         # Generate a user-friendly English weather answer
-        response = get_weather_llm_answer(question)
+        async with question_semaphore:
+            response = await get_weather_llm_answer(question, app.state.http, now)
         answer = response.get("text")
 
         if not answer:
@@ -97,7 +155,7 @@ async def handle_question(request: HandleQuestionRequest) -> Dict:
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"Error in handle_question: {str(e)}")
+        logger.error("Error in handle_question: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
@@ -0,0 +1,22 @@
+import asyncio
+import google.generativeai as genai
+from decouple import config
+from modules.upstream_calls import WARM_UP_TIMEOUT
+
+# --- Gemini client (configured once per process, shared by all modules) ---
+genai.configure(api_key=config("GOOGLE_GEMINI_API_KEY"))
+MODEL = genai.GenerativeModel("gemini-2.0-flash")
+
+
+async def warm_up() -> None:
+    """
+    Sends a minimal Gemini request so that the connection to the Gemini API (DNS, TLS, channel setup)
+    is established at startup rather than on the first user request.
+
+    Makes a single attempt bounded by `WARM_UP_TIMEOUT` (no retries), so a slow or rate-limited
+    Gemini API cannot hold up worker startup.
+    """
+    await asyncio.wait_for(
+        MODEL.generate_content_async("ping", generation_config=genai.GenerationConfig(max_output_tokens=1)),
+        WARM_UP_TIMEOUT,
+    )
@@ -1,4 +1,274 @@
-def get_city_and_forecast_days_for_weatherapi(question: str) -> dict:
+import asyncio
+import json
+import re
+from datetime import datetime, timedelta
+from modules import llm_semantic_cache
+from modules.gemini_client import genai, MODEL
+from modules.upstream_calls import call_gemini
+
+# --- Structured output (Gemini JSON mode) ---
+_EXTRACTION_PROPERTIES = {
+    "city": genai.protos.Schema(type_=genai.protos.Type.STRING),
+    "forecast_date": genai.protos.Schema(type_=genai.protos.Type.STRING),
+    "hour": genai.protos.Schema(type_=genai.protos.Type.INTEGER, nullable=True),
+}
+_EXTRACTION_SCHEMA = genai.protos.Schema(
+    type_=genai.protos.Type.OBJECT,
+    properties=_EXTRACTION_PROPERTIES,
+    required=["city", "forecast_date"],
+)
+# Batch items echo their question's position, so results are not matched by order alone
+_BATCH_ITEM_SCHEMA = genai.protos.Schema(
+    type_=genai.protos.Type.OBJECT,
+    properties={"index": genai.protos.Schema(type_=genai.protos.Type.INTEGER), **_EXTRACTION_PROPERTIES},
+    required=["index", "city", "forecast_date"],
+)
+_EXTRACTION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json", response_schema=_EXTRACTION_SCHEMA
+)
+_BATCH_EXTRACTION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=genai.protos.Schema(type_=genai.protos.Type.ARRAY, items=_BATCH_ITEM_SCHEMA),
+)
+
+# --- Micro-batching of concurrent extraction calls ---
+BATCH_MAX_SIZE = 8       # questions per Gemini call
+BATCH_MAX_WAIT = 0.02    # seconds to wait for more questions after the first one arrives
+
+_batch_queue = None      # asyncio.Queue of (question, today_str, future), set while the batcher is running
+_batch_tasks = set()     # in-flight batch tasks (keeps strong references)
+
+
+# --- Prompt templates (static parts built once, only today's date and the question(s) are inserted) ---
+_PROMPT_PREAMBLE = """
+You are an assistant specialized in extracting structured information from natural language.
+Extract from the text:
+
+1. The city mentioned, formatted exactly so it can be used as a query for api.weatherapi.com.
+2. The date the user is referring to, as YYYY-MM-DD.
+   - If the user writes relative expressions like "tomorrow", "day after tomorrow", "in 3 days", compute the actual date based on today.
+   - Today is """
+_PROMPT_MID = """.
+3. The hour (0-23) if specified; else null.
+"""
+_PROMPT_SINGLE = "\nText (given as a JSON string): "
+_PROMPT_BATCH = (
+    "\nThe texts are given as a JSON array of strings. Do this for each element of the array and "
+    "return a JSON array with exactly one object per element, in the same order. Set \"index\" of each "
+    "object to the 0-based position of its element in the array:\n"
+)
+
+
+def _build_prompt(questions: list, today_str: str) -> str:
+    """
+    Builds the extraction prompt for a single question or a batch of questions.
+
+    Questions are JSON-encoded, so quotes or newlines in one user's question cannot end it early
+    and change how the other questions of the same batch are read.
+    """
+    if len(questions) == 1:
+        question_json = json.dumps(questions[0], ensure_ascii=False)
+        return "".join([_PROMPT_PREAMBLE, today_str, _PROMPT_MID, _PROMPT_SINGLE, question_json, "\n"])
+
+    questions_json = json.dumps(questions, ensure_ascii=False)
+    return "".join([_PROMPT_PREAMBLE, today_str, _PROMPT_MID, _PROMPT_BATCH, questions_json, "\n"])
+
+
+async def _extract_batch(questions: list, today_str: str) -> list:
+    """
+    Extracts city, date and hour for one or more questions with a single Gemini call.
+
+    For a batch, every result echoes the position of its question as "index". Unless the indices are
+    exactly 0..n-1, a ValueError is raised (so `_process_batch` falls back to one call per question)
+    instead of risking one user's answer being based on another user's question.
+    """
+    prompt_text = _build_prompt(questions, today_str)
+
+    if len(questions) == 1:
+        response = await call_gemini(
+            lambda: MODEL.generate_content_async(prompt_text, generation_config=_EXTRACTION_CONFIG)
+        )
+        return [json.loads(response.text)]
+
+    response = await call_gemini(
+        lambda: MODEL.generate_content_async(prompt_text, generation_config=_BATCH_EXTRACTION_CONFIG)
+    )
+    results = json.loads(response.text)
+    indices = [result.get("index") for result in results]
+    if len(indices) != len(questions) or set(indices) != set(range(len(questions))):
+        raise ValueError(f"Batched extraction returned indices {indices} for {len(questions)} questions.")
+    results.sort(key=lambda result: result.pop("index"))
+    return results
+
+
+async def _process_batch(batch: list, today_str: str) -> None:
+    """Runs one batched extraction and resolves the future of every question in the batch."""
+    questions = [question for question, _ in batch]
+    try:
+        results = await _extract_batch(questions, today_str)
+    except Exception as e:
+        if len(batch) == 1:
+            results = [e]
+        else:
+            # --- Fallback: extract each question on its own ---
+            results = await asyncio.gather(
+                *(_extract_batch([question], today_str) for question in questions), return_exceptions=True
+            )
+            results = [r if isinstance(r, Exception) else r[0] for r in results]
+
+    for (_, future), result in zip(batch, results):
+        if future.done():
+            continue
+        if isinstance(result, Exception):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+
+async def run_extraction_batcher() -> None:
+    """
+    Background task that groups concurrent extraction requests into batched Gemini calls.
+
+    Collects questions from the queue until `BATCH_MAX_SIZE` questions are waiting or `BATCH_MAX_WAIT`
+    seconds have passed since the first one, then issues one Gemini call for the whole batch.
+    Started and cancelled by the FastAPI lifespan; while it is not running, every question is
+    extracted with its own Gemini call.
+    """
+    global _batch_queue
+    _batch_queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            batch = [await _batch_queue.get()]
+            deadline = loop.time() + BATCH_MAX_WAIT
+            while len(batch) < BATCH_MAX_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(_batch_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Questions sharing one prompt must share the request date (only differs around midnight)
+            by_date = {}
+            for question, today_str, future in batch:
+                by_date.setdefault(today_str, []).append((question, future))
+            for today_str, group in by_date.items():
+                task = asyncio.create_task(_process_batch(group, today_str))
+                _batch_tasks.add(task)
+                task.add_done_callback(_batch_tasks.discard)
+    finally:
+        # --- Hand questions still waiting in the queue to regular (unbatched) extraction ---
+        queue, _batch_queue = _batch_queue, None
+        while not queue.empty():
+            question, today_str, future = queue.get_nowait()
+            task = asyncio.create_task(_process_batch([(question, future)], today_str))
+            _batch_tasks.add(task)
+            task.add_done_callback(_batch_tasks.discard)
+
+
+async def _extract(question: str, today_str: str) -> dict:
+    """Extracts the raw city/date/hour dict for a question, batched when the batcher is running."""
+    if _batch_queue is None:
+        return (await _extract_batch([question], today_str))[0]
+
+    future = asyncio.get_running_loop().create_future()
+    await _batch_queue.put((question, today_str, future))
+    return await future
+
+
+# --- Date words (EN/DE) shared by the patterns below ---
+_MONTH_NAMES = (
+    r"january|february|march|april|may|june|july|august|september|october|november|december"
+    r"|januar|februar|märz|mai|juni|juli|oktober|dezember"
+)
+_WEEKDAY_NAMES = (
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday"
+    r"|montag|dienstag|mittwoch|donnerstag|freitag|samstag|sonnabend|sonntag"
+)
+_NUMBER_WORDS = (
+    r"one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve"
+    r"|eins?|zwei|drei|vier|fünf|sechs|sieben|acht|neun|zehn|elf|zwölf"
+)
+
+# --- Questions whose result must not be shared via the semantic cache ---
+# Absolute dates, hours, day counts and weekdays are not stable as an offset from today, and
+# questions differing only in them embed almost identically.
+_NOT_CACHEABLE_RE = re.compile(
+    rf"\d|\b(?:{_NUMBER_WORDS}|{_MONTH_NAMES}|{_WEEKDAY_NAMES})\b",
+    re.IGNORECASE,
+)
+# Relative days, times of day and periods resolve differently per question ("today" vs. "tonight"), yet
+# barely move the embedding; a cache hit must contain exactly the same ones, in the same order.
+_TIME_WORDS_RE = re.compile(
+    r"\b(?:today|tonight|tomorrow|yesterday|now|currently|later|after|next|this|last"
+    r"|morning|afternoon|evening|night|noon|midday|midnight|lunchtime|dawn|dusk|weekends?|weeks?|months?"
+    r"|heute|morgen|übermorgen|gestern|vorgestern|jetzt|gerade|später|nächsten?|nächster|nächstes"
+    r"|diesen?|dieser|dieses|früh|vormittags?|mittags?|nachmittags?|abends?|nachts?"
+    r"|wochenenden?|wochen?|monate?n?)\b",
+    re.IGNORECASE,
+)
+
+
+# --- Deterministic fast path for simple questions (no LLM call) ---
+_SIMPLE_TRIGGER_RE = re.compile(r"\b(?:weather|forecast|wetter)\b", re.IGNORECASE)
+_SIMPLE_DAY_WORDS = r"today|heute|now|jetzt|tomorrow|morgen"
+_SIMPLE_CITY_RE = re.compile(  # a single capitalized word (hyphens allowed, e.g. "Baden-Baden"), never a day word
+    rf"\b(?i:in|für)\s+(?!(?i:{_SIMPLE_DAY_WORDS})\b)([A-ZÄÖÜ][\w-]*)"
+)
+_SIMPLE_DAY_RE = re.compile(rf"\b({_SIMPLE_DAY_WORDS})\b", re.IGNORECASE)
+_SIMPLE_CITY_CONTINUATION_RE = re.compile(  # further word of the city name, e.g. "New York", "Rio de Janeiro"
+    rf"[ -](?:(?!(?i:{_SIMPLE_DAY_WORDS})\b)[A-ZÄÖÜ]"
+    r"|(?:de|da|do|dos|das|del|della|di|du|des|la|le|am|an|im|ob|auf|bei|upon|on|sur)\b)"
+)
+_SIMPLE_EXCLUDE_RE = re.compile(
+    r"\d|\b[ap]\.m\.|\bo['’]clock\b"                              # dates, hours, day counts
+    r"|\bafter\s+tomorrow\b|\bguten\s+morgen\b"                   # other days, greeting "Morgen"
+    r"|\b(?:not|nicht)\b"                                         # negations ("..., not today")
+    r"|\b(?:yesterday|gestern|vorgestern|later|später|uhr|am|pm"  # past days, later hours
+    r"|morning|afternoon|evening|night|tonight|noon|midday|midnight|lunchtime|früh"
+    r"|vormittags?|mittags?|nachmittags?|abends?|nachts?"         # times of day
+    r"|weekends?|wochenenden?|weeks?|wochen?|months?|monate?n?"   # longer periods
+    r"|compared?|comparison|versus|vs|than|between|vergleich\w*|verglichen|zwischen"
+    r"|als|and|und|or|oder"                                       # comparisons, several places or days
+    rf"|{_NUMBER_WORDS}|{_MONTH_NAMES}|{_WEEKDAY_NAMES})\b",
+    re.IGNORECASE,
+)
+_SIMPLE_DAY_OFFSETS = {"today": 0, "heute": 0, "now": 0, "jetzt": 0, "tomorrow": 1, "morgen": 1}
+
+
+def _extract_simple(question: str, now: datetime):
+    """
+    Parses simple template questions like "weather in Berlin tomorrow" without an LLM call.
+
+    Returns the result dict, or None if the question is not a plain combination of a weather keyword,
+    exactly one single-word city after "in"/"für" and exactly one of today/tomorrow/now (or German
+    equivalents), without any dates, hours, times of day, past days, weekdays, longer periods, comparisons,
+    conjunctions or negations. Cities of several words (e.g. "New York", "Rio de Janeiro") are left to the LLM.
+    """
+    if not _SIMPLE_TRIGGER_RE.search(question) or _SIMPLE_EXCLUDE_RE.search(question):
+        return None
+    city_matches = list(_SIMPLE_CITY_RE.finditer(question))
+    days = _SIMPLE_DAY_RE.findall(question)
+    if len(city_matches) != 1 or len(days) != 1:
+        return None
+    if _SIMPLE_CITY_CONTINUATION_RE.match(question, city_matches[0].end()):
+        return None
+
+    day = days[0].lower()
+    offset_days = _SIMPLE_DAY_OFFSETS[day]
+    target_date = now.date() + timedelta(days=offset_days)
+    return {
+        "city": city_matches[0].group(1),
+        "forecast_date": target_date.strftime("%Y-%m-%d"),
+        "forecast_date_obj": target_date,
+        "hour": now.hour if day in ("now", "jetzt") else None,
+        "forecast_days": offset_days + 1,
+    }
+
+
+async def get_city_and_forecast_days_for_weatherapi(question: str, now: datetime) -> dict:
     """
     Extracts structured information from a user's natural language question to determine the city,
     target date, and optional hour for a weather forecast query.
@@ -29,12 +299,17 @@ def get_city_and_forecast_days_for_weatherapi(question: str) -> dict:
         A natural language string from the user containing information about the city, date,
         and optionally the hour for which the weather forecast is requested.
 
+    now : datetime
+        The current time, taken once per request, so that all date calculations of a request
+        refer to the same day (even around midnight).
+
     Returns:
     --------
     dict
         A dictionary containing:
         - "city": str, the city formatted for WeatherAPI (fallback: "Berlin")
         - "forecast_date": str, the absolute date in "YYYY-MM-DD" format
+        - "forecast_date_obj": date or None, the same date already parsed, so callers need not parse it again
         - "hour": int or None, the requested hour (0–23) or None if not specified
         - "forecast_days": int, number of days from today until the target date (used for WeatherAPI)
 
@@ -42,67 +317,87 @@ def get_city_and_forecast_days_for_weatherapi(question: str) -> dict:
     ------
     - This function relies on an LLM (Gemini) for accurate extraction and interpretation
       of natural language date and time expressions.
+    - Gemini's native JSON mode with a response schema is used, so the response can be parsed
+      directly with `json.loads` without any text post-processing.
+    - The LLM is called asynchronously so the event loop is not blocked while waiting for Gemini.
+    - Concurrent questions are grouped into a single Gemini call by `run_extraction_batcher`
+      (up to `BATCH_MAX_SIZE` questions collected within `BATCH_MAX_WAIT` seconds).
     - Relative date expressions are automatically converted to absolute dates.
+    - Simple template questions (e.g. "weather in Berlin tomorrow") are parsed with precompiled regular
+      expressions and never reach the LLM; anything more complex falls back to the LLM.
+    - Results are stored in a semantic cache (see `modules.llm_semantic_cache`). If a previous
+      question is semantically close enough, its city appears in the new question and both contain the
+      same relative day / time-of-day words (e.g. "today" vs. "tonight"), its result is
+      reused and the LLM call is skipped; the forecast date is re-derived from the cached day offset
+      relative to today. Questions containing digits, number words, month names or weekdays are
+      neither looked up nor stored, since their dates and hours are not stable as offsets.
     - In case of an error with the LLM or JSON parsing, fallback defaults are provided:
       city = "Berlin", forecast_days = 1, hour = None, and an optional "error" message.
     """
-    import google.generativeai as genai
-    from decouple import config
-    import json
-    import re
-    from datetime import datetime
-
-    API_KEY = config("GOOGLE_GEMINI_API_KEY")
-    genai.configure(api_key=API_KEY)
-    model = genai.GenerativeModel("gemini-2.0-flash")
-
-    today_str = datetime.now().date().strftime("%Y-%m-%d")
-
-    prompt_text = f"""
-You are an assistant specialized in extracting structured information from natural language.
-Extract from the text:
+    today = now.date()
+    today_str = today.strftime("%Y-%m-%d")
 
-1. The city mentioned, formatted exactly so it can be used as a query for api.weatherapi.com.
-2. The date the user is referring to. 
-   - If the user writes relative expressions like "tomorrow", "day after tomorrow", "in 3 days", compute the actual date based on today.
-   - Today is {today_str}.
-3. The hour (0-23) if specified; else null.
+    # --- Fast path: simple template questions ---
+    simple_result = _extract_simple(question, now)
+    if simple_result is not None:
+        return simple_result
 
-Return a JSON dictionary with exactly three keys:
-{{
-    "city": "<city_name_for_weatherapi>",
-    "forecast_date": "<YYYY-MM-DD>",
-    "hour": <0-23 or null>
-}}
+    # --- Semantic cache lookup (only for questions without absolute dates, numbers or weekdays) ---
+    embedding = None
+    time_words = tuple(word.casefold() for word in _TIME_WORDS_RE.findall(question))
+    if not _NOT_CACHEABLE_RE.search(question):
+        try:
+            embedding = await llm_semantic_cache.embed_question(question)
+        except Exception:
+            pass  # embedding failed or timed out: skip the cache and go straight to the LLM
 
-Text: "{question}"
-"""
+    if embedding is not None:
+        cached = llm_semantic_cache.lookup(embedding)
+        # A hit is only trusted if its city appears in the new question and its time words are identical
+        if (cached is not None and cached["city"] and cached["city"].casefold() in question.casefold()
+                and cached["time_words"] == time_words):
+            del cached["time_words"]
+            offset_days = cached.pop("forecast_offset_days")
+            if offset_days is None:
+                cached["forecast_date"] = None
+                cached["forecast_date_obj"] = None
+                cached["forecast_days"] = 1
+            else:
+                target_date = today + timedelta(days=offset_days)
+                cached["forecast_date"] = target_date.strftime("%Y-%m-%d")
+                cached["forecast_date_obj"] = target_date
+                cached["forecast_days"] = offset_days + 1
+            return cached
 
     try:
-        # --- LLM call ---
-        response = model.generate_content(prompt_text)
-        result_text = response.text.strip()
-
-        # --- Extract JSON ---
-        match = re.search(r'{.*}', result_text, re.DOTALL)
-        if match:
-            result_dict = json.loads(match.group())
-        else:
-            result_dict = {"city": None, "forecast_date": None, "hour": None}
+        # --- LLM call (JSON mode, possibly batched with concurrent questions) ---
+        result_dict = await _extract(question, today_str)
 
         # --- Defaults / fallback ---
         result_dict.setdefault("city", "Berlin")
         result_dict.setdefault("hour", None)
 
         # --- Calculate forecast_days ---
-        today = datetime.now().date()
         target_date_str = result_dict.get("forecast_date")
         if target_date_str:
             target_date = datetime.strptime(target_date_str, "%Y-%m-%d").date()
+            result_dict["forecast_date_obj"] = target_date
             result_dict["forecast_days"] = (target_date - today).days + 1
         else:
+            result_dict["forecast_date_obj"] = None
             result_dict["forecast_days"] = 1  # fallback
 
+        # --- Store in semantic cache (dates as offsets so hits stay valid on later days) ---
+        # Entries whose city is not literally in the question could never be hit, so they are skipped
+        city = result_dict["city"]
+        if embedding is not None and city and city.casefold() in question.casefold():
+            llm_semantic_cache.store(embedding, {
+                "city": city,
+                "hour": result_dict["hour"],
+                "time_words": time_words,
+                "forecast_offset_days": result_dict["forecast_days"] - 1 if target_date_str else None
+            })
+
         return result_dict
 
     except Exception as e:
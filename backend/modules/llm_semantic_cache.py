@@ -0,0 +1,100 @@
+import asyncio
+import numpy as np
+from modules.gemini_client import genai
+from modules.upstream_calls import EMBEDDING_TIMEOUT
+
+# --- Cache settings ---
+EMBEDDING_MODEL = "models/text-embedding-004"
+SIMILARITY_THRESHOLD = 0.95   # minimum cosine similarity for a cache hit
+MAX_ENTRIES = 1000            # number of most recent questions kept in the cache
+
+_embeddings = None            # np.ndarray of shape (MAX_ENTRIES, dim), rows are L2-normalized
+_values = [None] * MAX_ENTRIES
+_size = 0
+_next_slot = 0
+
+
+async def gemini_embedder(text: str) -> np.ndarray:
+    """
+    Default embedder: computes an embedding of `text` with the Gemini embedding model.
+    """
+    result = await genai.embed_content_async(
+        model=EMBEDDING_MODEL, content=text, task_type="semantic_similarity"
+    )
+    return np.asarray(result["embedding"], dtype=np.float32)
+
+
+_embedder = gemini_embedder
+
+
+def set_embedder(embedder) -> None:
+    """
+    Replaces the embedder used for the semantic cache and clears all cached entries.
+
+    Parameters:
+    -----------
+    embedder : async callable
+        An async function taking a string and returning a 1-D vector (e.g. a local
+        sentence-transformers model wrapped in `asyncio.to_thread`). Since different embedders
+        produce incompatible vector spaces, the cache is emptied when the embedder changes.
+    """
+    global _embedder
+    _embedder = embedder
+    clear()
+
+
+def clear() -> None:
+    """Removes all entries from the semantic cache."""
+    global _embeddings, _values, _size, _next_slot
+    _embeddings = None
+    _values = [None] * MAX_ENTRIES
+    _size = 0
+    _next_slot = 0
+
+
+async def embed_question(question: str) -> np.ndarray:
+    """
+    Embeds a question with the configured embedder and returns the L2-normalized vector,
+    so that cosine similarity reduces to a dot product.
+
+    The embedder gets a single attempt of at most `EMBEDDING_TIMEOUT` seconds and is not retried:
+    the cache lookup runs before the extraction call, so a slow or rate-limited embedding endpoint
+    must not delay it. Callers skip the cache when this raises.
+    """
+    vector = np.asarray(await asyncio.wait_for(_embedder(question), EMBEDDING_TIMEOUT), dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def lookup(embedding: np.ndarray):
+    """
+    Returns a copy of the cached value whose question is most similar to `embedding`,
+    or None if no cached question reaches `SIMILARITY_THRESHOLD`.
+
+    The similarity against all cached questions is computed in a single vectorized
+    matrix-vector product.
+    """
+    if _size == 0 or _embeddings.shape[1] != embedding.shape[0]:
+        return None
+
+    similarities = _embeddings[:_size] @ embedding
+    best = int(np.argmax(similarities))
+    if similarities[best] < SIMILARITY_THRESHOLD:
+        return None
+    return dict(_values[best])
+
+
+def store(embedding: np.ndarray, value: dict) -> None:
+    """
+    Stores `value` for the question represented by `embedding`. Once `MAX_ENTRIES` is reached,
+    the oldest entry is overwritten (ring buffer).
+    """
+    global _embeddings, _size, _next_slot
+    if _embeddings is None or _embeddings.shape[1] != embedding.shape[0]:
+        clear()
+        _embeddings = np.zeros((MAX_ENTRIES, embedding.shape[0]), dtype=np.float32)
+
+    _embeddings[_next_slot] = embedding
+    _values[_next_slot] = dict(value)
+    _next_slot = (_next_slot + 1) % MAX_ENTRIES
+    _size = min(_size + 1, MAX_ENTRIES)
@@ -1,24 +1,51 @@
-def get_weather_llm_answer(question: str) -> dict:
+import json
+import logging
+import httpx
+from datetime import datetime
+from modules.weatherapi_forecast_data import get_weather_forecast
+from modules.upstream_calls import call_gemini
+from modules.gemini_client import MODEL
+
+logger = logging.getLogger(__name__)
+
+# --- Prompt template (static, only the dynamic values are inserted per request) ---
+_ANSWER_PROMPT_TMPL = """
+You are a friendly AI assistant. Using the following weather data,
+create a short, clear, and user-friendly text for the user.
+
+User question (given as a JSON string): {question}
+
+Weather data: {weather_data}
+
+Guidelines:
+- Respond in the language of the user's question.
+- Summarize the most important information: current weather, temperature, and forecast.
+- Focus the description on the time window from {hours_before} hours before to {hours_after} hours after the requested hour.
+- Make the text friendly, readable, and natural.
+- Do not return JSON, code, or structured data — only plain text.
+"""
+
+
+async def get_weather_llm_answer(question: str, http_client: httpx.AsyncClient, now: datetime) -> dict:
     """
     Generates a user-friendly, natural language weather forecast response using an LLM (Large Language Model)
-    based on a user's question. The output language matches the detected language of the user's input.
+    based on a user's question. The output language matches the language of the user's input.
 
     This function performs the following steps:
-    1. Detects the language of the user's question using a language detection library.
-       - If detection fails, defaults to English.
-    2. Calls `get_weather_forecast` to retrieve structured weather data for the target city and date.
+    1. Calls `get_weather_forecast` to retrieve structured weather data for the target city and date.
        - Includes hourly forecasts within a configurable time window around the requested hour.
        - Handles fallback cases if the city, date, or hour are missing.
-    3. Prompts the Gemini LLM to convert the structured weather data into a short, clear, and natural text
-       response that is readable and user-friendly.
-    4. Returns the generated text.
+    2. Prompts the Gemini LLM with the user's question and the structured weather data to produce a short,
+       clear, and natural text response in the language of the question.
+    3. Returns the generated text.
 
     Features:
     ---------
     - Automatically summarizes current weather, daily forecast, and optionally hourly details.
     - Adjusts the description to focus on a time window from `hours_before` hours before to `hours_after` hours
       after the requested hour.
-    - Produces text in the same language as the user's question for better user experience.
+    - Produces text in the same language as the user's question for better user experience; the language is
+      inferred by Gemini from the question itself, so no separate language detection step is needed.
     - Handles errors gracefully, providing fallback messages if the LLM or API fails.
 
     Parameters:
@@ -27,6 +54,12 @@ def get_weather_llm_answer(question: str) -> dict:
         A natural language question or statement from the user that includes information about the desired
         city, date, and optionally the hour for which weather information is requested.
 
+    http_client : httpx.AsyncClient
+        The shared HTTP client used for the WeatherAPI and IP geolocation requests.
+
+    now : datetime
+        The current time, taken once per request and passed down to all date calculations.
+
     Returns:
     --------
     dict
@@ -41,52 +74,32 @@ def get_weather_llm_answer(question: str) -> dict:
     - The LLM prompt ensures that no JSON, code, or structured data is returned—only natural language text.
     - The hourly forecast is included only if requested and within the defined time window.
     - If the weather data cannot be retrieved, a default error message is returned.
+    - The extraction call and this answer call are intentionally kept separate: the answer depends on the
+      WeatherAPI data, so merging them via Gemini function calling would still need two sequential turns,
+      while the separate extraction step can be served from the semantic cache without any LLM call.
     """
-    import google.generativeai as genai
-    from decouple import config
-    from modules.weatherapi_forecast_data import get_weather_forecast
-    from langdetect import detect
-
-    # --- Detect language of the user's question ---
-    try:
-        user_language = detect(question)
-    except:
-        user_language = "en"  # fallback to English
-
     # --- Get weather data (including hourly forecast) ---
     hours_before = 2
     hours_after = 3
-    weather_data = get_weather_forecast(
-        question, include_hours=True, hours_before=hours_before, hours_after=hours_after
+    weather_data = await get_weather_forecast(
+        question, http_client, now, include_hours=True, hours_before=hours_before, hours_after=hours_after
     )
-    print("weather_data:", weather_data)  # Debugging
+    logger.debug("weather_data: %s", weather_data)
 
     if not weather_data or "error" in weather_data:
         return {"text": "Sorry, the weather data could not be retrieved."}
 
     # --- Prepare prompt for Gemini LLM ---
-    prompt_text = f"""
-You are a friendly AI assistant. Using the following weather data,
-create a short, clear, and user-friendly text for the user.
-
-Weather data: {weather_data}
-
-Guidelines:
-- Respond in the language of the user's question (detected language: {user_language}).
-- Summarize the most important information: current weather, temperature, and forecast.
-- Focus the description on the time window from {hours_before} hours before to {hours_after} hours after the requested hour.
-- Make the text friendly, readable, and natural.
-- Do not return JSON, code, or structured data — only plain text.
-"""
-
-    # --- Configure Gemini API ---
-    API_KEY = config("GOOGLE_GEMINI_API_KEY")
-    genai.configure(api_key=API_KEY)
-    model = genai.GenerativeModel("gemini-2.0-flash")
+    prompt_text = _ANSWER_PROMPT_TMPL.format(
+        question=json.dumps(question, ensure_ascii=False),
+        weather_data=weather_data,
+        hours_before=hours_before,
+        hours_after=hours_after,
+    )
 
     try:
         # --- Call the LLM ---
-        response = model.generate_content(prompt_text)
+        response = await call_gemini(lambda: MODEL.generate_content_async(prompt_text))
         result_text = response.text.strip()
 
         return {"text": result_text}
@@ -0,0 +1,82 @@
+import asyncio
+import httpx
+from google.api_core import exceptions as google_exceptions
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+# --- Timeouts (seconds) ---
+GEMINI_TIMEOUT = 15
+WEATHERAPI_TIMEOUT = 5
+IPINFO_TIMEOUT = 2
+WARM_UP_TIMEOUT = 3   # single attempt, startup must not wait on a slow upstream
+EMBEDDING_TIMEOUT = 1   # single attempt, the semantic cache is skipped if embedding is slow
+
+# --- Retry / concurrency settings ---
+MAX_ATTEMPTS = 3
+MAX_CONCURRENT_GEMINI_CALLS = 200   # avoids 429s from Gemini under bursts
+
+_gemini_semaphore = asyncio.Semaphore(MAX_CONCURRENT_GEMINI_CALLS)
+
+_RETRYABLE_GEMINI_ERRORS = (
+    google_exceptions.TooManyRequests,     # includes gRPC ResourceExhausted
+    google_exceptions.InternalServerError,
+    google_exceptions.ServiceUnavailable,
+)
+
+
+class _RetryableStatus(Exception):
+    """Raised internally for HTTP responses with status 429 or 5xx so that they are retried."""
+
+    def __init__(self, response: httpx.Response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+def _retrying(retryable) -> AsyncRetrying:
+    return AsyncRetrying(
+        retry=retry_if_exception_type(retryable),
+        stop=stop_after_attempt(MAX_ATTEMPTS),
+        wait=wait_exponential_jitter(initial=0.5, max=4),
+        reraise=True,
+    )
+
+
+async def call_gemini(make_call):
+    """
+    Runs a Gemini request with a concurrency limit, a timeout and retries.
+
+    Parameters:
+    -----------
+    make_call : callable
+        A function without arguments returning a new awaitable for the Gemini request
+        (e.g. `lambda: model.generate_content_async(prompt)`), called once per attempt.
+
+    Notes:
+    ------
+    - At most `MAX_CONCURRENT_GEMINI_CALLS` Gemini requests run concurrently per process.
+    - Each attempt is cancelled after `GEMINI_TIMEOUT` seconds (`asyncio.TimeoutError`, not retried).
+    - Rate limit (429) and server (5xx) errors are retried up to `MAX_ATTEMPTS` times with
+      exponential backoff; the last error is re-raised.
+    """
+    async for attempt in _retrying(_RETRYABLE_GEMINI_ERRORS):
+        with attempt:
+            async with _gemini_semaphore:
+                return await asyncio.wait_for(make_call(), GEMINI_TIMEOUT)
+
+
+async def http_get(http_client: httpx.AsyncClient, url: str, timeout: float) -> httpx.Response:
+    """
+    Performs a GET request with a timeout, retrying 429/5xx responses and transport errors.
+
+    Each attempt is cancelled after `timeout` seconds (`asyncio.TimeoutError`, not retried).
+    Up to `MAX_ATTEMPTS` attempts are made with exponential backoff; if the last attempt still
+    returns 429/5xx, that response is returned so the caller can report the status code.
+    """
+    try:
+        async for attempt in _retrying((_RetryableStatus, httpx.TransportError)):
+            with attempt:
+                response = await asyncio.wait_for(http_client.get(url), timeout)
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise _RetryableStatus(response)
+                return response
+    except _RetryableStatus as e:
+        return e.response
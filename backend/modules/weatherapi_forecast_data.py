@@ -1,9 +1,86 @@
-import requests
+import asyncio
+import logging
+import time
+import httpx
+import orjson
 from modules.llm_extract_city_and_forecast_days import get_city_and_forecast_days_for_weatherapi
+from modules.upstream_calls import http_get, IPINFO_TIMEOUT, WEATHERAPI_TIMEOUT, WARM_UP_TIMEOUT
 from decouple import config
 from datetime import datetime, timedelta
 
-def get_weather_forecast(question: str, include_hours: bool, hours_before: int, hours_after: int) -> dict:
+logger = logging.getLogger(__name__)
+
+# --- In-process TTL caches ---
+FORECAST_CACHE_MAXSIZE = 1024
+FORECAST_TTL_TODAY = 300         # seconds, forecasts for today change quickly
+FORECAST_TTL_FUTURE = 3600       # seconds, forecasts for future dates
+IP_CITY_TTL = 24 * 3600          # seconds, the server location rarely changes
+
+_forecast_cache = {}             # {(city, target_date_str, forecast_days): (expires_at, forecast_day)}
+_forecast_cache_lock = asyncio.Lock()
+_ip_city_cache = None            # (expires_at, city)
+
+
+async def _get_cached_forecast(key: tuple):
+    """Returns the cached forecast day for `key`, or None if missing or expired."""
+    async with _forecast_cache_lock:
+        entry = _forecast_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at <= time.monotonic():
+            del _forecast_cache[key]
+            return None
+        return data
+
+
+async def _set_cached_forecast(key: tuple, data: dict, ttl: int) -> None:
+    """Stores a forecast day for `key`, evicting expired (or else the oldest) entries when full."""
+    async with _forecast_cache_lock:
+        if len(_forecast_cache) >= FORECAST_CACHE_MAXSIZE:
+            now = time.monotonic()
+            for k in [k for k, (expires_at, _) in _forecast_cache.items() if expires_at <= now]:
+                del _forecast_cache[k]
+            if len(_forecast_cache) >= FORECAST_CACHE_MAXSIZE:
+                del _forecast_cache[next(iter(_forecast_cache))]
+        _forecast_cache[key] = (time.monotonic() + ttl, data)
+
+
+async def _get_ip_city(http_client: httpx.AsyncClient) -> str:
+    """
+    Detects the current city via IP geolocation, cached for `IP_CITY_TTL` seconds.
+
+    Raises if the lookup fails or returns no city; failures are not cached.
+    """
+    global _ip_city_cache
+    if _ip_city_cache is not None and _ip_city_cache[0] > time.monotonic():
+        return _ip_city_cache[1]
+
+    ip_response = await http_get(http_client, "https://ipinfo.io/json", IPINFO_TIMEOUT)
+    if ip_response.status_code != 200:
+        # Not cached, so a rate limit or outage does not pin the fallback city for a day
+        raise ValueError(f"IP geolocation failed with status code {ip_response.status_code}.")
+    city = orjson.loads(ip_response.content).get("city")
+    if not city:
+        raise ValueError("IP geolocation returned no city.")
+    _ip_city_cache = (time.monotonic() + IP_CITY_TTL, city)
+    return city
+
+
+async def warm_up(http_client: httpx.AsyncClient) -> None:
+    """
+    Sends a cheap WeatherAPI request so that DNS resolution and the pooled connection to
+    api.weatherapi.com are ready before the first user request.
+
+    Makes a single attempt bounded by `WARM_UP_TIMEOUT` (no retries), so a slow or rate-limited
+    WeatherAPI cannot hold up worker startup.
+    """
+    api_key = config("WEATHERAPI_API_KEY")
+    url = f"http://api.weatherapi.com/v1/current.json?key={api_key}&q=Berlin&aqi=no"
+    await asyncio.wait_for(http_client.get(url), WARM_UP_TIMEOUT)
+
+
+async def get_weather_forecast(question: str, http_client: httpx.AsyncClient, now: datetime, include_hours: bool, hours_before: int, hours_after: int) -> dict:
     """
     Retrieves the weather forecast for a specific day and city based on a user's natural language query.
     
@@ -38,6 +115,13 @@ def get_weather_forecast(question: str, include_hours: bool, hours_before: int,
     question : str
         A natural language question or statement from the user that includes information about the desired city,
         date, and optionally the hour for which weather information is requested.
+
+    http_client : httpx.AsyncClient
+        The shared HTTP client (created in the FastAPI lifespan) used for all outbound requests,
+        so connections are pooled and kept alive across requests.
+
+    now : datetime
+        The current time, taken once per request and used for all date and hour calculations.
     
     include_hours : bool
         If True, includes hourly forecast data in the output; otherwise, only daily summary is returned.
@@ -70,51 +154,66 @@ def get_weather_forecast(question: str, include_hours: bool, hours_before: int,
     - Hourly data is optional and will only be returned if requested.
     - The function handles relative dates such as "tomorrow" or "in 3 days" automatically.
     - Fallbacks are in place for missing city, date, or hour to provide robust behavior.
+    - All upstream calls (LLM, IP geolocation, WeatherAPI) are awaited asynchronously, bounded by timeouts
+      and retried on 429/5xx responses (see `modules.upstream_calls`).
+    - The target day of each WeatherAPI response is cached in-process per (city, target date, forecast days) for
+      `FORECAST_TTL_TODAY` seconds (today) or `FORECAST_TTL_FUTURE` seconds (future dates);
+      the IP-detected city is cached for `IP_CITY_TTL` seconds.
     """
     api_key = config("WEATHERAPI_API_KEY")
 
     # --- LLM call ---
-    result = get_city_and_forecast_days_for_weatherapi(question)
+    result = await get_city_and_forecast_days_for_weatherapi(question, now)
     city = result.get("city")
     hour = result.get("hour")
     target_date_str = result.get("forecast_date")  # e.g., "2025-11-23"
+    target_date = result.get("forecast_date_obj")   # already parsed by the extractor
 
-    today = datetime.now().date()
+    today = now.date()
 
     # --- Fallback target date ---
-    if not target_date_str:
+    if target_date is None:
         target_date = today
         target_date_str = target_date.strftime("%Y-%m-%d")
-    else:
-        target_date = datetime.strptime(target_date_str, "%Y-%m-%d").date()
 
     # --- Fallback city via IP ---
     if not city:
         try:
-            ip_data = requests.get("https://ipinfo.io/json").json()
-            city = ip_data.get("city", "Berlin")
+            city = await _get_ip_city(http_client)
         except:
             city = "Berlin"
 
     # --- Fallback hour ---
     if hour is None:
-        hour = (datetime.now().hour + 2) % 24
+        hour = (now.hour + 2) % 24
 
     forecast_days = (target_date - today).days + 1
 
-    print(city, hour, target_date_str)
-    # --- WeatherAPI request ---
-    url = f"http://api.weatherapi.com/v1/forecast.json?key={api_key}&q={city}&days={forecast_days}&aqi=no&alerts=no"
-    response = requests.get(url)
-    if response.status_code != 200:
-        return {"error": f"Failed to retrieve weather data, status code {response.status_code}."}
+    logger.debug("city=%s hour=%s target_date=%s", city, hour, target_date_str)
+    # --- WeatherAPI request (served from the TTL cache when possible) ---
+    cache_key = (city.lower(), target_date_str, forecast_days)
+    forecast_day = await _get_cached_forecast(cache_key)
+    if forecast_day is None:
+        url = f"http://api.weatherapi.com/v1/forecast.json?key={api_key}&q={city}&days={forecast_days}&aqi=no&alerts=no"
+        try:
+            response = await http_get(http_client, url, WEATHERAPI_TIMEOUT)
+        except (asyncio.TimeoutError, httpx.HTTPError) as e:
+            return {"error": f"Failed to retrieve weather data: {e!r}"}
+        if response.status_code != 200:
+            return {"error": f"Failed to retrieve weather data, status code {response.status_code}."}
+
+        data = orjson.loads(response.content)
 
-    data = response.json()
+        # --- Filter exactly the target day ---
+        by_date = {d["date"]: d for d in data["forecast"]["forecastday"]}
+        forecast_day = by_date.get(target_date_str)
+        del data, by_date  # free the rest of the response before building the prompt
+        if not forecast_day:
+            return {"error": "Forecast for target date not found."}
 
-    # --- Filter exactly the target day ---
-    forecast_day = next((d for d in data["forecast"]["forecastday"] if d["date"] == target_date_str), None)
-    if not forecast_day:
-        return {"error": "Forecast for target date not found."}
+        # Only the target day is cached; it is the only part of the response ever used for this key
+        ttl = FORECAST_TTL_TODAY if target_date == today else FORECAST_TTL_FUTURE
+        await _set_cached_forecast(cache_key, forecast_day, ttl)
 
     day_dict = {
         "date": forecast_day["date"],
@@ -130,7 +229,7 @@ def get_weather_forecast(question: str, include_hours: bool, hours_before: int,
         day_dict["hours"] = [
             {"time": h["time"], "temp_c": h["temp_c"], "condition": h["condition"]["text"]}
             for h in forecast_day["hour"]
-            if start_hour <= datetime.strptime(h["time"], "%Y-%m-%d %H:%M").hour <= end_hour
+            if start_hour <= int(h["time"][11:13]) <= end_hour  # time is always "YYYY-MM-DD HH:MM"
         ]
 
     return {"city": city, "forecast_day": day_dict}
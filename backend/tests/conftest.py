@@ -0,0 +1,5 @@
+import os
+
+# The modules read their API keys at import time; tests never reach the real APIs.
+os.environ.setdefault("GOOGLE_GEMINI_API_KEY", "test")
+os.environ.setdefault("WEATHERAPI_API_KEY", "test")
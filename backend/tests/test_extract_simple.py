@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+
+from modules.llm_extract_city_and_forecast_days import _extract_simple
+
+NOW = datetime(2025, 11, 20, 9, 30)
+
+
+@pytest.mark.parametrize("question, city, forecast_date, hour", [
+    ("weather in Berlin tomorrow", "Berlin", "2025-11-21", None),
+    ("What's the weather in Berlin today?", "Berlin", "2025-11-20", None),
+    ("Weather in Berlin Today", "Berlin", "2025-11-20", None),
+    ("Weather in Berlin Tomorrow?", "Berlin", "2025-11-21", None),
+    ("weather in Berlin now", "Berlin", "2025-11-20", 9),
+    ("Weather forecast for tomorrow in Hamburg", "Hamburg", "2025-11-21", None),
+    ("Wie wird das Wetter morgen in München?", "München", "2025-11-21", None),
+    ("Wetter für Morgen in Köln", "Köln", "2025-11-21", None),
+    ("Wie ist das Wetter in Baden-Baden heute?", "Baden-Baden", "2025-11-20", None),
+])
+def test_simple_questions_are_parsed(question, city, forecast_date, hour):
+    result = _extract_simple(question, NOW)
+    assert result is not None
+    assert (result["city"], result["forecast_date"], result["hour"]) == (city, forecast_date, hour)
+
+
+@pytest.mark.parametrize("question", [
+    "weather in Berlin Germany today",
+    "weather in New York tomorrow",
+    "weather in Rio de Janeiro today",
+    "Wetter in Frankfurt am Main morgen",
+    "weather in Berlin tomorrow at three",
+    "weather in Berlin tomorrow at 3",
+    "weather in Berlin tomorrow at three o'clock",
+    "weather in Berlin tomorrow 3 pm",
+    "weather in Berlin tomorrow at lunchtime",
+    "weather in Berlin later today",
+    "weather in Berlin tomorrow morning",
+    "weather in Berlin tonight",
+    "weather in Berlin the day after tomorrow",
+    "weather in Berlin yesterday and today",
+    "Wie war das Wetter gestern in Berlin, und heute?",
+    "Wetter in Berlin morgen um drei Uhr",
+    "How was the weather in Paris today compared to London",
+    "Is the weather in Paris today better than London?",
+    "Wetter heute in Paris im Vergleich zu London",
+    "weather in Berlin or Hamburg today",
+    "weather in Berlin today, not tomorrow",
+    "weather in Berlin this weekend",
+    "weather in Berlin on Friday",
+    "weather in Berlin",
+    "Guten Morgen, wie ist das Wetter in Berlin?",
+    "Will it rain in Berlin today?",
+])
+def test_other_questions_are_left_to_the_llm(question):
+    assert _extract_simple(question, NOW) is None
@@ -0,0 +1,61 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from modules import llm_extract_city_and_forecast_days as extractor
+
+QUESTIONS = ["Weather in Paris?", "Weather in Rome?", "Weather in Oslo?"]
+
+
+def fake_gemini(monkeypatch, batch_results):
+    """Answers batch prompts with `batch_results` and single prompts with the question's last word as city."""
+    calls = []
+
+    async def fake_call_gemini(make_call):
+        return await make_call()
+
+    class FakeModel:
+        async def generate_content_async(self, prompt_text, generation_config=None):
+            calls.append(prompt_text)
+            payload = json.loads(prompt_text.strip().splitlines()[-1].split(": ", 1)[-1])
+            if isinstance(payload, list):
+                return SimpleNamespace(text=json.dumps(batch_results))
+            city = payload.rstrip("?").split()[-1]
+            return SimpleNamespace(text=json.dumps({"city": city, "forecast_date": "2025-11-20", "hour": None}))
+
+    monkeypatch.setattr(extractor, "call_gemini", fake_call_gemini)
+    monkeypatch.setattr(extractor, "MODEL", FakeModel())
+    return calls
+
+
+def run_batch(questions):
+    async def run():
+        loop = asyncio.get_running_loop()
+        batch = [(question, loop.create_future()) for question in questions]
+        await extractor._process_batch(batch, "2025-11-20")
+        return [future.result()["city"] for _, future in batch]
+    return asyncio.run(run())
+
+
+def result(index, city):
+    return {"index": index, "city": city, "forecast_date": "2025-11-20", "hour": None}
+
+
+def test_batch_results_are_mapped_by_index(monkeypatch):
+    calls = fake_gemini(monkeypatch, [result(2, "Oslo"), result(0, "Paris"), result(1, "Rome")])
+    assert run_batch(QUESTIONS) == ["Paris", "Rome", "Oslo"]
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("batch_results", [
+    [result(0, "Paris"), result(0, "Rome"), result(2, "Oslo")],       # duplicate index
+    [result(0, "Paris"), result(1, "Rome"), result(3, "Oslo")],       # index out of range
+    [result(0, "Paris"), result(1, "Rome")],                          # missing result
+    [result(0, "Paris"), result(1, "Rome"), {"city": "Oslo", "forecast_date": "2025-11-20"}],  # no index
+])
+def test_invalid_batch_indices_fall_back_to_single_calls(monkeypatch, batch_results):
+    calls = fake_gemini(monkeypatch, batch_results)
+    assert run_batch(QUESTIONS) == ["Paris", "Rome", "Oslo"]
+    assert len(calls) == 1 + len(QUESTIONS)
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from modules import llm_extract_city_and_forecast_days as extractor
+from modules import llm_semantic_cache
+
+NOW = datetime(2025, 11, 20, 9, 30)
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Every question embeds identically; the LLM is replaced by a fake that records its calls."""
+    async def constant_embedder(text):
+        return np.ones(8, dtype=np.float32)
+
+    calls = []
+
+    async def fake_extract(question, today_str):
+        calls.append(question)
+        return {"city": "Berlin", "forecast_date": today_str, "hour": None}
+
+    llm_semantic_cache.set_embedder(constant_embedder)
+    monkeypatch.setattr(extractor, "_extract", fake_extract)
+    yield calls
+    llm_semantic_cache.set_embedder(llm_semantic_cache.gemini_embedder)
+
+
+def ask(question):
+    return asyncio.run(extractor.get_city_and_forecast_days_for_weatherapi(question, NOW))
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Will it rain in Berlin today?", "Will it rain in Berlin tomorrow?"),
+    ("Will it rain in Berlin tomorrow?", "Will it rain in Berlin the day after tomorrow?"),
+    ("Will it rain in Berlin today?", "Will it rain in Berlin tonight?"),
+    ("Is it sunny in Berlin this morning?", "Is it sunny in Berlin this evening?"),
+    ("Will it rain in Berlin?", "Will it rain in Berlin tonight?"),
+    ("Regnet es heute in Berlin?", "Regnet es übermorgen in Berlin?"),
+])
+def test_different_time_words_miss_the_cache(llm_calls, first, second):
+    ask(first)
+    ask(second)
+    assert llm_calls == [first, second]
+
+
+def test_same_time_words_hit_the_cache(llm_calls):
+    ask("Will it rain in Berlin tonight?")
+    result = ask("Is rain expected in Berlin tonight?")
+    assert llm_calls == ["Will it rain in Berlin tonight?"]
+    assert result["city"] == "Berlin"
+    assert result["forecast_date"] == "2025-11-20"
+    assert "time_words" not in result
+
+
+def test_other_city_misses_the_cache(llm_calls):
+    ask("Will it rain in Berlin tonight?")
+    ask("Will it rain in Hamburg tonight?")
+    assert len(llm_calls) == 2